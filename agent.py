@@ -1,8 +1,19 @@
+import hashlib
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
+from config import MAX_PARALLEL_REQUESTS, LOG_STEP_DELAY
+
+# Prefer orjson (Rust + SIMD) for parsing multi-kilobyte LLM plan output;
+# fall back to the stdlib parser when it is not installed.
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 # Import all core components
 from analyzer import CodeAnalyzer
 from prompts import PromptEngine
@@ -34,6 +45,52 @@ class CodeAgent:
         }
         self.project_root = self.analyzer.project_root
 
+        # Memoized (key, rendered string) for the combined context block;
+        # consecutive code steps usually share identical context files
+        self._context_cache = (None, None)
+
+        # Per-task caches: resolved Path objects for plan targets, and
+        # the result of exists() checks (invalidated by file/dir actions)
+        self._resolved_paths: Dict[str, Path] = {}
+        self._exists_cache: Dict[str, bool] = {}
+
+        # No preload here: main.Components already warms the session's
+        # actual model (--model) when it constructs the client; warming
+        # DEFAULT_MODEL as well would load a second model for nothing.
+
+    def _salvage_partial_plan(self, raw_json_plan: str) -> Optional[List[ActionStep]]:
+        """
+        Recovers the valid prefix of a truncated/malformed plan array by
+        decoding one element at a time with json.JSONDecoder.raw_decode.
+        LLMs frequently hit their context cap mid-array; the completed steps
+        before the cut-off are still usable, and discarding them wastes the
+        whole generation call.
+        """
+        start = raw_json_plan.find('[')
+        if start == -1:
+            return None
+
+        decoder = json.JSONDecoder()
+        steps: List[ActionStep] = []
+        idx = start + 1
+        length = len(raw_json_plan)
+
+        while idx < length:
+            # Skip element separators and whitespace
+            while idx < length and raw_json_plan[idx] in ' \t\r\n,':
+                idx += 1
+            if idx >= length or raw_json_plan[idx] == ']':
+                break
+            try:
+                obj, idx = decoder.raw_decode(raw_json_plan, idx)
+            except ValueError:
+                break
+            if not isinstance(obj, dict):
+                break
+            steps.append(obj)
+
+        return steps or None
+
     def _generate_plan(self, goal: str, context_summary: str, model_name: str) -> Optional[List[ActionStep]]:
         """
         Calls the LLM with the Planning Prompt to generate a JSON Action Plan.
@@ -52,8 +109,11 @@ class CodeAgent:
         
         # 3. Parse the LLM's JSON response
         try:
-            # The client cleans up markdown fences, so we expect raw JSON
-            plan = json.loads(raw_json_plan)
+            # The client cleans up markdown fences, so we expect raw JSON.
+            # Parse from UTF-8 bytes: orjson validates/decodes with SIMD
+            # end-to-end instead of re-encoding the str input internally,
+            # and stdlib json.loads accepts bytes as well.
+            plan = _json_loads(raw_json_plan.encode('utf-8') if isinstance(raw_json_plan, str) else raw_json_plan)
             if not isinstance(plan, list):
                  # This is the error path the user encountered. Improved feedback here.
                  print("PLANNING ERROR: LLM returned non-list JSON. Expected array of steps.")
@@ -61,14 +121,174 @@ class CodeAgent:
                  return None
             print(f"--- AGENT: PLAN GENERATED ({len(plan)} steps) ---")
             return plan
-        except json.JSONDecodeError as e:
+        except ValueError as e:  # covers json.JSONDecodeError and orjson.JSONDecodeError
             print(f"PLANNING ERROR: Failed to decode LLM response into plan JSON. Error: {e}")
+            # Try to salvage the valid prefix of a truncated array before
+            # writing off the entire (expensive) generation
+            salvaged = self._salvage_partial_plan(raw_json_plan)
+            if salvaged:
+                print(f"--- AGENT: SALVAGED PARTIAL PLAN ({len(salvaged)} steps from truncated response) ---")
+                return salvaged
             print(f"Raw Response: {raw_json_plan[:300]}...")
             return None
 
-    def _execute_step(self, step: ActionStep, model_name: str) -> bool:
+    def _path_exists(self, target: str, full_path: Path) -> bool:
+        """
+        Cached exists() check: one stat per distinct target per task instead
+        of one per step touching it. File/dir handlers update the cache when
+        they change the filesystem.
+        """
+        cached = self._exists_cache.get(target)
+        if cached is None:
+            cached = full_path.exists()
+            self._exists_cache[target] = cached
+        return cached
+
+    def _build_context(self) -> str:
+        """
+        Returns the combined markdown context block for all files in state,
+        rebuilding it only when a file's content has actually changed.
+        Keyed by sorted (path, digest) pairs so the O(total_context_bytes)
+        string assembly is skipped between steps that share context.
+        """
+        # Snapshot items() first: concurrent wave steps insert generated
+        # files into context_files from worker threads, and iterating the
+        # live dict while one lands raises RuntimeError.
+        files = list(self.state['context_files'].items())
+        key = tuple(sorted(
+            (path, hashlib.blake2b(content.encode('utf-8'), digest_size=8).digest())
+            for path, content in files
+        ))
+        cached_key, cached_context = self._context_cache
+        if key == cached_key:
+            return cached_context
+
+        # Render from the same snapshot the key was built from, so the
+        # cached string always matches its key
+        snapshot = dict(files)
+        context = self.analyzer.get_multiple_context(list(snapshot.keys()), snapshot)
+        self._context_cache = (key, context)
+        return context
+
+    # Decode-length bins (in tokens) for batching steps of similar output size.
+    # A concurrent batch is gated by its longest member, so short generations
+    # are dispatched separately from long ones.
+    OUTPUT_BINS = [512, 2048, 8192]
+
+    def _estimate_output_tokens(self, step: ActionStep) -> int:
         """
-        Executes a single step from the generated plan.
+        Cheap predictor for the decode length of a code-generation step.
+        MODIFY_CODE rewrites an existing file, so its current size (plus slack
+        for additions) is a good proxy; for new files fall back to a
+        description-length heuristic. Assumes ~4 characters per token.
+        """
+        target = step.get('target', '')
+        existing = self.state['context_files'].get(target, '')
+        if existing:
+            estimated_chars = len(existing) * 1.2
+        else:
+            estimated_chars = max(len(step.get('description', '')) * 20, 2000)
+        return int(estimated_chars // 4)
+
+    # --- Step handlers (dispatched via _ACTION_HANDLERS below) ---
+
+    def _do_get_context(self, step: ActionStep, target: str, full_path: Path, model_name: str, num_predict: Optional[int]) -> bool:
+        """ACTION 1: Read a file and store its content in the agent's state."""
+        print(f"  -> Reading context from file: {target}...")
+        context = self.analyzer.get_context(target, mode='full')
+
+        if context['content'].startswith("FILE_ERROR"):
+            print(f"  -> ERROR reading file: {context['content']}")
+            self.state['errors'].append(f"Failed to read file: {target}")
+            return False
+
+        self.state['context_files'][target] = context['content']
+        self.state['target_language'] = context['language']
+        print(f"  -> Context stored for {target}.")
+        return True
+
+    def _do_code_action(self, step: ActionStep, target: str, full_path: Path, model_name: str, num_predict: Optional[int]) -> bool:
+        """ACTIONS 2/3: Generate or Modify file content based on accumulated context."""
+        action = step.get('action', '').upper()
+        description = step.get('description', 'No description provided.')
+
+        full_context = self._build_context()
+
+        if not full_context:
+            print("  -> ERROR: Cannot execute code action without context. Aborting step.")
+            return False
+
+        payload = self.engine.create_execution_prompt(
+            task_description=description,
+            accumulated_context=full_context,
+            target_file=target,
+            project_language=self.state['target_language'],
+            model_name=model_name,
+            num_predict=num_predict
+        )
+
+        print(f"  -> Calling LLM to {action.lower()} content for {target}...")
+        # Stream the completion so decode overlaps with transfer
+        raw_content = self.client.generate_content_streaming(payload)
+
+        if raw_content.startswith("ERROR:"):
+            print(f"  -> LLM/Client Error: {raw_content}")
+            self.state['errors'].append(f"LLM failed to generate content for {target}")
+            return False
+
+        # Dispatch to editor (it handles modify vs create based on existence)
+        if self._path_exists(target, full_path):
+            success = self.editor._execute_modify(full_path, raw_content)
+        else:
+            success = self.editor._execute_create(full_path, raw_content)
+
+        # Update agent state with the new/modified content
+        if success:
+            self.state['context_files'][target] = raw_content
+            self._exists_cache[target] = True
+        return success
+
+    def _do_create_dir(self, step: ActionStep, target: str, full_path: Path, model_name: str, num_predict: Optional[int]) -> bool:
+        success = self.editor._execute_create_dir(full_path)
+        if success:
+            self._exists_cache[target] = True
+        return success
+
+    def _do_delete_dir(self, step: ActionStep, target: str, full_path: Path, model_name: str, num_predict: Optional[int]) -> bool:
+        # NOTE: We don't remove files from state context here, as files inside
+        # the deleted directory might still be relevant for planning/reporting.
+        success = self.editor._execute_delete_dir(full_path)
+        if success:
+            # Paths under the deleted directory are stale — drop the whole cache
+            self._exists_cache.clear()
+        return success
+
+    def _do_report_success(self, step: ActionStep, target: str, full_path: Path, model_name: str, num_predict: Optional[int]) -> bool:
+        """ACTION 6: Final step."""
+        print(f"  -> Final action completed. Agent task finished.")
+        return True
+
+    def _do_unknown(self, step: ActionStep, target: str, full_path: Path, model_name: str, num_predict: Optional[int]) -> bool:
+        action = step.get('action', '').upper()
+        print(f"  -> WARNING: Unknown action type '{action}'. Skipping step.")
+        self.state['errors'].append(f"Unknown action: {action}")
+        return False
+
+    # Single O(1) lookup replaces the former if/elif chain; GENERATE_CODE and
+    # MODIFY_CODE share one handler instead of two duplicated branches.
+    _ACTION_HANDLERS = {
+        'GET_CONTEXT': _do_get_context,
+        'GENERATE_CODE': _do_code_action,
+        'MODIFY_CODE': _do_code_action,
+        'CREATE_DIR': _do_create_dir,
+        'DELETE_DIR': _do_delete_dir,
+        'REPORT_SUCCESS': _do_report_success,
+    }
+
+    def _execute_step(self, step: ActionStep, model_name: str, num_predict: Optional[int] = None) -> bool:
+        """
+        Executes a single step from the generated plan by dispatching to the
+        matching action handler.
         """
         action = step.get('action', '').upper()
         target = step.get('target', '')
@@ -77,78 +297,103 @@ class CodeAgent:
         print(f"\n--- EXECUTING STEP: {action} on {target} ---")
         print(f"Description: {description}")
 
-        success = False
-        full_path = self.project_root / target # Resolve path early
-
-        if action == 'GET_CONTEXT':
-            # ACTION 1: Read a file and store its content in the agent's state
-            print(f"  -> Reading context from file: {target}...")
-            context = self.analyzer.get_context(target, mode='full')
-            
-            if not context['content'].startswith("FILE_ERROR"):
-                self.state['context_files'][target] = context['content']
-                self.state['target_language'] = context['language']
-                success = True
-                print(f"  -> Context stored for {target}.")
+        # Reuse the Path precomputed in run_task when available
+        full_path = self._resolved_paths.get(target) or (self.project_root / target)
+
+        handler = self._ACTION_HANDLERS.get(action, CodeAgent._do_unknown)
+        success = handler(self, step, target, full_path, model_name, num_predict)
+
+        # Optional delay for better log reading (disabled by default)
+        if LOG_STEP_DELAY:
+            time.sleep(LOG_STEP_DELAY)
+        return success
+
+    def _partition_waves(self, plan: List[ActionStep]) -> List[List[ActionStep]]:
+        """
+        Groups consecutive independent code-generation steps into 'waves' that can
+        be dispatched concurrently. Two steps are independent when neither reads
+        the other's target file, so consecutive GENERATE_CODE/MODIFY_CODE steps
+        with distinct targets form one wave. All other actions (context reads,
+        directory changes, REPORT_SUCCESS) act as sequential barriers.
+        """
+        waves: List[List[ActionStep]] = []
+        current_wave: List[ActionStep] = []
+        current_targets: set = set()
+
+        current_kind = None  # 'code' or 'read' waves can hold multiple steps
+
+        for step in plan:
+            action = step.get('action', '').upper()
+            target = step.get('target', '')
+
+            if action in ('GENERATE_CODE', 'MODIFY_CODE'):
+                kind = 'code'
+            elif action == 'GET_CONTEXT':
+                kind = 'read'
             else:
-                print(f"  -> ERROR reading file: {context['content']}")
-                self.state['errors'].append(f"Failed to read file: {target}")
-
-        elif action == 'GENERATE_CODE' or action == 'MODIFY_CODE':
-            # ACTIONS 2/3: Generate or Modify file content based on accumulated context
-            
-            full_context = self.analyzer.get_multiple_context(list(self.state['context_files'].keys()), self.state['context_files'])
-            
-            if not full_context:
-                print("  -> ERROR: Cannot execute code action without context. Aborting step.")
-                return False
-
-            payload = self.engine.create_execution_prompt(
-                task_description=description,
-                accumulated_context=full_context,
-                target_file=target,
-                project_language=self.state['target_language'],
-                model_name=model_name
-            )
-
-            print(f"  -> Calling LLM to {action.lower()} content for {target}...")
-            raw_content = self.client.generate_content(payload)
-            
-            if raw_content.startswith("ERROR:"):
-                print(f"  -> LLM/Client Error: {raw_content}")
-                self.state['errors'].append(f"LLM failed to generate content for {target}")
-                return False
-            
-            # Dispatch to editor (it handles modify vs create based on existence)
-            if full_path.exists():
-                success = self.editor._execute_modify(full_path, raw_content)
+                kind = None
+
+            if kind is not None and kind == (current_kind or kind) and target not in current_targets:
+                current_wave.append(step)
+                current_targets.add(target)
+                current_kind = kind
             else:
-                success = self.editor._execute_create(full_path, raw_content)
-            
-            # Update agent state with the new/modified content
-            if success:
-                self.state['context_files'][target] = raw_content
-                
-        elif action == 'CREATE_DIR': # <-- NEW FOLDER ACTION
-            success = self.editor._execute_create_dir(full_path)
-            
-        elif action == 'DELETE_DIR': # <-- NEW FOLDER ACTION
-            # NOTE: We don't remove files from state context here, as files inside 
-            # the deleted directory might still be relevant for planning/reporting.
-            success = self.editor._execute_delete_dir(full_path)
-        
-        elif action == 'REPORT_SUCCESS':
-            # ACTION 6: Final step
-            print(f"  -> Final action completed. Agent task finished.")
-            success = True
-        
-        else:
-            print(f"  -> WARNING: Unknown action type '{action}'. Skipping step.")
-            self.state['errors'].append(f"Unknown action: {action}")
-        
-        # Short delay for better log reading
-        time.sleep(0.5) 
-        return success
+                # Dependency, kind switch or barrier action: flush the wave
+                if current_wave:
+                    waves.append(current_wave)
+                current_wave = []
+                current_targets = set()
+                current_kind = None
+                if kind is None:
+                    waves.append([step])
+                else:
+                    current_wave = [step]
+                    current_targets = {target}
+                    current_kind = kind
+
+        if current_wave:
+            waves.append(current_wave)
+        return waves
+
+    def _run_wave(self, wave: List[ActionStep], model_name: str) -> bool:
+        """
+        Executes a wave of independent steps. Single-step waves run inline;
+        multi-step waves fan out over a thread pool so the blocking HTTP calls
+        to Ollama overlap (wall time becomes max instead of sum of the calls).
+        """
+        if len(wave) == 1:
+            return self._execute_step(wave[0], model_name)
+
+        if wave[0].get('action', '').upper() == 'GET_CONTEXT':
+            # Context reads are pure disk I/O (the read releases the GIL), so
+            # a batch of them completes in max(read_time) instead of the sum
+            print(f"\n--- AGENT: READING {len(wave)} CONTEXT FILES CONCURRENTLY ---")
+            with ThreadPoolExecutor(max_workers=min(len(wave), 16)) as pool:
+                results = list(pool.map(lambda s: self._execute_step(s, model_name), wave))
+            return all(results)
+
+        # Bucket the wave by predicted output length so one long generation
+        # does not stall a batch of short ones; each bin carries a matching
+        # num_predict cap for the Ollama scheduler. The cap exists to group
+        # similar decode lengths, not to squeeze the generation itself, so
+        # pick the smallest bin with 2x headroom over the estimate — and run
+        # anything bigger uncapped (num_predict omitted): a cap at or below
+        # the prediction would guarantee a truncated file.
+        bins: Dict[Optional[int], List[ActionStep]] = {}
+        for step in wave:
+            estimate = self._estimate_output_tokens(step)
+            bin_cap = next((cap for cap in self.OUTPUT_BINS if estimate * 2 <= cap), None)
+            bins.setdefault(bin_cap, []).append(step)
+
+        all_successful = True
+        for bin_cap in sorted(bins, key=lambda cap: (cap is None, cap or 0)):
+            batch = bins[bin_cap]
+            cap_label = f"max ~{bin_cap} tokens" if bin_cap else "uncapped"
+            print(f"\n--- AGENT: DISPATCHING {len(batch)} INDEPENDENT STEPS CONCURRENTLY ({cap_label}) ---")
+            with ThreadPoolExecutor(max_workers=min(len(batch), MAX_PARALLEL_REQUESTS)) as pool:
+                results = list(pool.map(lambda s: self._execute_step(s, model_name, num_predict=bin_cap), batch))
+            all_successful = all_successful and all(results)
+        return all_successful
 
     def run_task(self, goal: str, model_name: str) -> bool:
         """
@@ -177,13 +422,24 @@ class CodeAgent:
         if not self.plan:
             print("\nTASK FAILED: Plan generation failed. Aborting.")
             return False
-            
-        # 3. Act (Execute the plan iteratively)
+
+        # Resolve every distinct plan target once and reset the stat cache
+        self._resolved_paths = {
+            step['target']: self.project_root / step['target']
+            for step in self.plan if step.get('target')
+        }
+        self._exists_cache = {}
+
+        # 3. Act (Execute the plan in dependency-ordered waves; independent
+        #    code-generation steps within a wave run concurrently)
         all_successful = True
-        for i, step in enumerate(self.plan, 1):
-            print(f"\n[STEP {i}/{len(self.plan)}] Executing plan step...")
-            if not self._execute_step(step, model_name):
-                print(f"PLAN EXECUTION FAILED at step {i}: {step.get('action')}. Aborting subsequent steps.")
+        waves = self._partition_waves(self.plan)
+        step_count = 0
+        for wave in waves:
+            step_count += len(wave)
+            print(f"\n[WAVE {step_count}/{len(self.plan)} steps dispatched] Executing plan wave ({len(wave)} step(s))...")
+            if not self._run_wave(wave, model_name):
+                print(f"PLAN EXECUTION FAILED in wave containing: {[s.get('action') for s in wave]}. Aborting subsequent steps.")
                 all_successful = False
                 break
         
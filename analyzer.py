@@ -1,7 +1,12 @@
 import os
+import re
+import json
+import hashlib
+import sqlite3
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-from utils import run_git_command # We import the utility function
+from utils import run_git_command_text, read_git_head # We import the utility functions
 
 class CodeAnalyzer:
     """
@@ -28,7 +33,15 @@ class CodeAnalyzer:
     }
     
     # Files/directories to ignore during project summary
-    IGNORE_PATTERNS = ['.git', '__pycache__', '.env', 'node_modules', '*.log']
+    IGNORE_PATTERNS = ['.git', '.ollamadev', '__pycache__', '.env', 'node_modules', '*.log']
+
+    # Single compiled pattern over IGNORE_PATTERNS: '*.ext' entries become
+    # suffix matches, plain names become exact matches. Compiled once at
+    # class-definition time instead of per-file generator expressions.
+    _IGNORE_RE = re.compile('|'.join(
+        (re.escape(p[1:]) + '$') if p.startswith('*') else ('^' + re.escape(p) + '$')
+        for p in IGNORE_PATTERNS
+    ))
 
     def __init__(self, project_root: str):
         """
@@ -37,9 +50,37 @@ class CodeAnalyzer:
         self.project_root = Path(project_root).resolve()
         if not self.project_root.is_dir():
             raise FileNotFoundError(f"Project root directory not found: {project_root}")
+        self._cache_conn = self._init_content_cache()
+        # Serializes access to the shared SQLite connection when context
+        # reads are dispatched from a thread pool
+        self._cache_lock = threading.Lock()
         print(f"Analyzer initialized for project root: {self.project_root}")
 
 
+    def _init_content_cache(self) -> Optional[sqlite3.Connection]:
+        """
+        Opens (or creates) the on-disk content cache under .ollamadev/.
+        Cached entries are keyed by relative path with an (mtime_ns, size)
+        fast-path and a sha256 digest, so unchanged files are never re-read
+        across GET_CONTEXT steps or agent runs. Returns None if the cache
+        cannot be created (the analyzer then falls back to plain reads).
+        """
+        try:
+            cache_dir = self.project_root / '.ollamadev'
+            cache_dir.mkdir(exist_ok=True)
+            conn = sqlite3.connect(str(cache_dir / 'analyzer_cache.sqlite'), check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_cache ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+                "sha256 TEXT, content TEXT)"
+            )
+            conn.commit()
+            return conn
+        except Exception as e:
+            print(f"Warning: Could not initialize analyzer cache ({e}). Falling back to uncached reads.")
+            return None
+
+
     def _detect_language(self, filepath: Path) -> str:
         """
         Infers the programming language based on the file extension.
@@ -55,23 +96,61 @@ class CodeAnalyzer:
         """
         # Command: git diff --unified=1 --no-prefix <filepath>
         command = ['diff', '--unified=1', '--no-prefix', relative_path]
-        diff_content = run_git_command(command, cwd=str(self.project_root))
+        diff_content = run_git_command_text(command, cwd=str(self.project_root))
         return diff_content
 
 
     def _read_file_content(self, relative_path: str) -> str:
         """
-        Reads the full content of a file.
+        Reads the full content of a file, consulting the on-disk cache first.
+        A stat() match on (mtime_ns, size) returns the cached content without
+        touching the file body; on mismatch the file is re-read, hashed and
+        the cache entry refreshed.
         """
         full_path = self.project_root / relative_path
         try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            stat = full_path.stat()
         except FileNotFoundError:
             return f"FILE_ERROR: File not found at {full_path}"
+        except Exception as e:
+            return f"FILE_ERROR: Could not stat file {full_path}. Reason: {e}"
+
+        if self._cache_conn is not None:
+            with self._cache_lock:
+                row = self._cache_conn.execute(
+                    "SELECT mtime_ns, size, content FROM file_cache WHERE path = ?",
+                    (relative_path,)
+                ).fetchone()
+            if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+                return row[2]
+
+        try:
+            # Read raw bytes and decode once — avoids the incremental UTF-8
+            # decoding of text-mode reads on mostly-ASCII source files
+            data = full_path.read_bytes()
         except Exception as e:
             return f"FILE_ERROR: Could not read file {full_path}. Reason: {e}"
 
+        try:
+            content = data.decode('utf-8')
+        except UnicodeDecodeError:
+            content = data.decode('utf-8', errors='replace')
+
+        if self._cache_conn is not None:
+            try:
+                digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                with self._cache_lock:
+                    self._cache_conn.execute(
+                        "INSERT OR REPLACE INTO file_cache (path, mtime_ns, size, sha256, content) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (relative_path, stat.st_mtime_ns, stat.st_size, digest, content)
+                    )
+                    self._cache_conn.commit()
+            except Exception as e:
+                print(f"Warning: Failed to update analyzer cache for {relative_path}: {e}")
+
+        return content
+
 
     def get_context(self, relative_path: str, mode: str) -> dict:
         """
@@ -112,30 +191,109 @@ class CodeAnalyzer:
         """
         Generates a high-level summary of the codebase structure (file list).
         This is used primarily for the LLM planning step.
+
+        Prefers a single `git ls-files` call, which produces the already-
+        filtered file list at C speed and honors .gitignore natively; falls
+        back to a Python directory walk for non-git project roots.
         """
         print("  -> Generating project file list...")
-        summary = ["Project File Structure (relative paths):"]
-        
-        for root, dirs, files in os.walk(self.project_root):
-            # Prune ignored directories
-            dirs[:] = [d for d in dirs if d not in self.IGNORE_PATTERNS and not d.startswith('.')]
-            
-            relative_root = Path(root).relative_to(self.project_root)
-            
-            for f in files:
-                # Prune ignored files
-                if any(f.endswith(p.lstrip('*')) for p in self.IGNORE_PATTERNS if p.startswith('*')) or f in self.IGNORE_PATTERNS:
-                    continue
-                    
-                relative_path = relative_root / f
-                if str(relative_path) == '.': # Skip the root itself if it appears
+
+        cache_key = self._summary_cache_key()
+        summary_cache = self.project_root / '.ollamadev' / 'summary.json'
+        if cache_key:
+            try:
+                cached = json.loads(summary_cache.read_text(encoding='utf-8'))
+                if cached.get('key') == cache_key:
+                    print("  -> Reusing cached project summary (repository unchanged).")
+                    return cached['summary']
+            except (OSError, ValueError, KeyError):
+                pass
+
+        summary = self._build_project_summary()
+
+        if cache_key and not summary.startswith("ERROR"):
+            try:
+                summary_cache.parent.mkdir(exist_ok=True)
+                summary_cache.write_text(
+                    json.dumps({'key': cache_key, 'summary': summary}), encoding='utf-8'
+                )
+            except OSError as e:
+                print(f"Warning: Could not write summary cache: {e}")
+
+        return summary
+
+    def _summary_cache_key(self) -> Optional[str]:
+        """
+        Digest of the repository state (HEAD plus porcelain status, which
+        covers staged, modified and untracked paths). Identical keys mean an
+        identical file list — and byte-identical summary strings also let
+        Ollama reuse its prompt KV-cache between planner calls. Returns None
+        outside a git repository.
+        """
+        # Resolve HEAD in-process where possible; fork a git subprocess only
+        # for layouts the fast path does not understand
+        head = read_git_head(str(self.project_root))
+        if head is None:
+            head = run_git_command_text(['rev-parse', 'HEAD'], cwd=str(self.project_root))
+            if head.startswith(("GIT_ERROR", "ERROR")):
+                return None
+        status = run_git_command_text(['status', '--porcelain'], cwd=str(self.project_root))
+        if status.startswith("GIT_ERROR"):
+            return None
+        return hashlib.blake2b(f"{head}|{status}".encode('utf-8'), digest_size=16).hexdigest()
+
+    def _build_project_summary(self) -> str:
+        """Computes the summary string (git ls-files, or the walker fallback)."""
+        file_list = run_git_command_text(
+            ['ls-files', '--cached', '--others', '--exclude-standard'],
+            cwd=str(self.project_root)
+        )
+        if not file_list.startswith(("GIT_ERROR", "ERROR")):
+            # ls-files reports untracked files too, which includes our own
+            # cache directory — filter it out of the summary
+            files = [f for f in file_list.splitlines()
+                     if f and not f.startswith('.ollamadev/')]
+            if files:
+                summary = ["Project File Structure (relative paths):"]
+                summary.extend(f"- {f}" for f in files)
+                return "\n".join(summary)
+
+        print("  -> Git file listing unavailable. Falling back to directory walk.")
+        return self._walk_project_summary()
+
+    def _iter_project_files(self, directory, prefix: str = ''):
+        """
+        Recursively yields relative file paths under `directory` using
+        os.scandir, whose entries carry the file type from the directory
+        read itself — no extra stat() per file. Entries matching
+        _IGNORE_RE and hidden directories are pruned.
+        """
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            return
+        with entries:
+            for entry in entries:
+                name = entry.name
+                if self._IGNORE_RE.search(name):
                     continue
+                if entry.is_dir(follow_symlinks=False):
+                    if not name.startswith('.'):
+                        yield from self._iter_project_files(entry.path, prefix + name + '/')
+                else:
+                    yield prefix + name
+
+    def _walk_project_summary(self) -> str:
+        """
+        Fallback summary generator for non-git roots: walks the tree with
+        os.scandir and filters against the precompiled ignore pattern.
+        """
+        summary = ["Project File Structure (relative paths):"]
+        summary.extend(f"- {path}" for path in self._iter_project_files(self.project_root))
 
-                summary.append(f"- {relative_path}")
-                
         if len(summary) == 1:
             return "ERROR: No code files found in the project root."
-            
+
         return "\n".join(summary)
 
 
@@ -154,23 +312,30 @@ class CodeAnalyzer:
         if not file_paths:
             return ""
 
-        combined_context = []
-        
-        # Detect a common language for the entire context block (use 'python' if ambiguous)
-        primary_language = 'text'
+        # Resolve each path's language exactly once with plain string
+        # partitioning — no Path or splitext machinery per file
+        lang_by_path = {}
         for path in file_paths:
-            if path in file_contents:
-                lang = self._detect_language(Path(path))
-                if lang != 'text':
-                    primary_language = lang
-                    break
-        
+            _, sep, ext = path.rpartition('.')
+            if sep and '/' not in ext and '\\' not in ext:
+                lang_by_path[path] = self.LANGUAGE_MAP.get('.' + ext.lower(), 'text')
+            else:
+                lang_by_path[path] = 'text'
+
+        # Detect a common language for the entire context block
+        primary_language = next(
+            (lang_by_path[p] for p in file_paths if p in file_contents and lang_by_path[p] != 'text'),
+            'text'
+        )
+
+        # Build the fenced block with a single final join — no intermediate
+        # joined string, which matters for multi-hundred-KB contexts
+        buf = [f"```{primary_language}\n"]
         for path in file_paths:
             content = file_contents.get(path)
             if content:
                 # Use a comment/delimiter to clearly separate files
-                combined_context.append(f"\n/* --- FILE: {path} ({self.LANGUAGE_MAP.get(Path(path).suffix.lower(), 'text').upper()}) --- */\n")
-                combined_context.append(content)
-        
-        # Wrap the whole block in a markdown code fence for the LLM
-        return f"```{primary_language}\n" + "\n".join(combined_context) + "\n```"
+                buf.append(f"\n/* --- FILE: {path} ({lang_by_path[path].upper()}) --- */\n\n")
+                buf.append(content)
+        buf.append("\n```")
+        return ''.join(buf)
@@ -3,9 +3,43 @@
 # --- Ollama API Settings ---
 OLLAMA_BASE_URL = "http://10.73.78.161:11434"
 OLLAMA_GENERATE_ENDPOINT = f"{OLLAMA_BASE_URL}/api/generate"
+# Batched embeddings endpoint: accepts "input": [...] so a whole batch of
+# texts costs one POST instead of one per item.
+OLLAMA_EMBED_ENDPOINT = f"{OLLAMA_BASE_URL}/api/embed"
 
 # --- LLM Model Selection ---
 # Use a strong code model available on your local Ollama instance.
 # Example models: codellama:7b-instruct, mixtral:8x7b-instruct-v0.1-q4_0
 # DEFAULT_MODEL = "qwen3-coder:30b"
 DEFAULT_MODEL = "mixtral:8x7b-instruct-v0.1-q4_K_M"
+
+# --- Concurrency Settings ---
+# Maximum number of LLM requests dispatched concurrently per plan wave.
+# Should match the OLLAMA_NUM_PARALLEL setting of the Ollama server so its
+# continuous-batching scheduler can batch the burst in one decode loop.
+import os
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+MAX_PARALLEL_REQUESTS = OLLAMA_NUM_PARALLEL
+
+# --- Ollama Performance Settings ---
+# Context window requested for tasks without a per-task override in
+# prompts._NUM_CTX (plan and execute carry their own sizes). Set to 0 to
+# omit num_ctx from payloads and use the model's own default.
+OLLAMA_NUM_CTX = 4096
+# Tokens reserved inside the execute context window for everything that
+# is NOT the accumulated context block: system prompt, task description
+# and the generated output. prompts derives the context budget as
+# _NUM_CTX['execute'] minus this reserve, so the budget tracks the
+# execute window automatically; overflowing files are dropped oldest-first.
+CONTEXT_OUTPUT_RESERVE = 2048
+# How long Ollama keeps the model resident after a request.
+OLLAMA_KEEP_ALIVE = "30m"
+# (connect, read) timeouts in seconds for HTTP calls to Ollama.
+HTTP_TIMEOUT = (5.0, 600.0)
+# Base (seconds) for the client's exponential retry backoff: base * 2^attempt.
+RETRY_BACKOFF = 1.0
+
+# --- Logging Settings ---
+# Optional pause (seconds) after each agent step for log readability.
+# Disabled by default; set to e.g. 0.5 when watching the agent live.
+LOG_STEP_DELAY = 0.0
@@ -1,21 +1,23 @@
+import io
 import os
+import sys
 import json
-import subprocess
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-import re 
-import difflib 
-import shutil # <-- NEW: Import shutil for recursive directory deletion
+import re
 
-# Assuming utils.py is available for shell command execution
-try:
-    from utils import run_git_command
-except ImportError:
-    # Define a simplified placeholder if utils.py is not available in test environment
-    def run_git_command(command_parts, cwd='.'):
-        """Placeholder for actual run_git_command from utils.py"""
-        print(f"[Placeholder] Executing: git {' '.join(command_parts)} in {cwd}")
-        return f"Placeholder executed: {' '.join(command_parts)}"
+# NOTE: difflib and shutil are imported lazily inside the helpers that use
+# them — commands that never execute editor actions (e.g. 'review') then
+# skip their import cost at startup.
+
+# Precompiled extractors for LLM action responses: a fenced JSON array
+# (```json ... ```) and any conversational chatter before the first
+# bracket/brace. Compiled once at import instead of per parse call.
+_FENCE_RE = re.compile(r'```(?:json)?\s*(\[.*\])\s*```', re.DOTALL)
+_CHATTER_PREFIX_RE = re.compile(r'^[^\[{]*')
 
 
 class CodeEditor:
@@ -26,19 +28,48 @@ class CodeEditor:
     UPDATED to include directory creation and deletion actions.
     """
 
-    def __init__(self, project_root: str):
+    def __init__(self, project_root: str, show_diff_preview: bool = False):
         """
         Initializes the editor with the project's root directory.
+
+        Args:
+            project_root: Root directory of the target project.
+            show_diff_preview: When True, MODIFY actions print a unified diff
+                               of the change before writing (debug aid).
         """
         self.project_root = Path(project_root).resolve()
         if not self.project_root.is_dir():
             raise FileNotFoundError(f"Project root directory not found: {project_root}")
+        self.show_diff_preview = show_diff_preview
+        # Cached string form of the resolved root: path joining and
+        # relativizing below use plain string operations instead of
+        # re-walking Path parts per action
+        self._root_str = str(self.project_root) + os.sep
+        # path -> (mtime_ns, size, blake2b digest) for files we last wrote
+        # or verified; lets _execute_modify skip reading an unchanged file
+        self._file_sig_cache: Dict[str, tuple] = {}
         print(f"Editor initialized for project root: {self.project_root}")
 
+    def _relative_str(self, filepath: Path) -> str:
+        """Relative display path via string slicing (no Path.relative_to walk)."""
+        path_str = str(filepath)
+        if path_str.startswith(self._root_str):
+            return path_str[len(self._root_str):]
+        return path_str
+
     def _parse_actions(self, json_string: str) -> Optional[List[Dict[str, str]]]:
         """
         Parses the LLM's raw JSON output into a list of action dictionaries.
+        Falls back to a repair-tolerant element-by-element reparse for the
+        common LLM failure modes (markdown fences, leading chatter, Python
+        literals, truncated output), salvaging the valid prefix.
         """
+        # Unwrap a fenced array if present, then drop leading chatter
+        # (walrus keeps it to a single regex pass each)
+        if (match := _FENCE_RE.search(json_string)):
+            json_string = match.group(1)
+        json_string = _CHATTER_PREFIX_RE.sub('', json_string, count=1)
+
         try:
             actions = json.loads(json_string)
             if not isinstance(actions, list):
@@ -47,15 +78,125 @@ class CodeEditor:
             return actions
         except json.JSONDecodeError as e:
             print(f"JSON Parsing Error: Failed to decode LLM response into actions. Error: {e}")
-            print(f"Raw Response: {json_string[:200]}...")
-            return None
+            print("Attempting tolerant reparse of the response...")
+
+        actions = list(self._parse_actions_stream([json_string]))
+        if actions:
+            print(f"Tolerant reparse recovered {len(actions)} action(s).")
+            return actions
+
+        print(f"Raw Response: {json_string[:200]}...")
+        return None
+
+    def _normalize_llm_json(self, text: str) -> str:
+        """
+        Rewrites Python literals (None/True/False) to their JSON equivalents
+        in one pass, leaving string contents untouched.
+        """
+        out = []
+        in_string = escaped = False
+        i = 0
+        length = len(text)
+        while i < length:
+            ch = text[i]
+            if in_string:
+                out.append(ch)
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+                i += 1
+            elif ch == '"':
+                in_string = True
+                out.append(ch)
+                i += 1
+            elif text.startswith('None', i):
+                out.append('null')
+                i += 4
+            elif text.startswith('True', i):
+                out.append('true')
+                i += 4
+            elif text.startswith('False', i):
+                out.append('false')
+                i += 5
+            else:
+                out.append(ch)
+                i += 1
+        return ''.join(out)
 
-    def _read_file_content(self, filepath: Path) -> Optional[List[str]]:
-        """Reads content of a file, returning lines for difflib."""
+    def _parse_actions_stream(self, chunks_iter):
+        """
+        Incrementally yields action dicts from an iterable of response text
+        chunks (e.g. OllamaClient.stream_generate). A small string/bracket
+        state machine skips any chatter before the top-level '[' and emits
+        each array element as soon as it completes, so actions become
+        available before the LLM finishes — and a truncated response still
+        yields its valid prefix.
+        """
+        in_array = False
+        in_string = escaped = False
+        depth = 0           # nesting depth within the current element
+        elem: List[str] = []
+
+        for chunk in chunks_iter:
+            for ch in chunk:
+                if not in_array:
+                    if ch == '[':
+                        in_array = True
+                    continue
+                if in_string:
+                    elem.append(ch)
+                    if escaped:
+                        escaped = False
+                    elif ch == '\\':
+                        escaped = True
+                    elif ch == '"':
+                        in_string = False
+                elif ch == '"':
+                    in_string = True
+                    elem.append(ch)
+                elif ch in '{[':
+                    depth += 1
+                    elem.append(ch)
+                elif ch in '}]':
+                    if depth == 0 and ch == ']':
+                        # Closing bracket of the top-level array
+                        yield from self._finalize_stream_element(elem)
+                        return
+                    depth -= 1
+                    elem.append(ch)
+                elif ch == ',' and depth == 0:
+                    yield from self._finalize_stream_element(elem)
+                    elem = []
+                else:
+                    elem.append(ch)
+
+        # Stream ended without the closing bracket (truncated response)
+        yield from self._finalize_stream_element(elem)
+
+    def _finalize_stream_element(self, elem_chars: List[str]):
+        """Decodes one buffered array element, yielding it if it is a dict."""
+        text = ''.join(elem_chars).strip()
+        if not text:
+            return
+        try:
+            obj = json.loads(self._normalize_llm_json(text))
+        except ValueError:
+            return
+        if isinstance(obj, dict):
+            yield obj
+
+    def _read_file_content(self, filepath: Path) -> Optional[bytes]:
+        """
+        Reads content of a file as raw bytes. Callers compare bytes directly
+        (one allocation, no decode, no per-line str objects) and only decode
+        into lines when a diff preview actually needs them.
+        """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                # Use splitlines(True) to keep newline characters for accurate diffing
-                return f.read().splitlines(True)
+            with open(filepath, 'rb') as f:
+                return f.read()
         except FileNotFoundError:
             return None
         except Exception as e:
@@ -67,7 +208,7 @@ class CodeEditor:
         """
         Creates a new directory (and its parents if necessary).
         """
-        relative_path = dirpath.relative_to(self.project_root)
+        relative_path = self._relative_str(dirpath)
         print(f"  -> Action: CREATE_DIR {relative_path}")
         
         if dirpath.exists() and dirpath.is_dir():
@@ -88,135 +229,248 @@ class CodeEditor:
         """
         Deletes a directory and all its contents recursively.
         """
-        relative_path = dirpath.relative_to(self.project_root)
+        relative_path = self._relative_str(dirpath)
         print(f"  -> Action: DELETE_DIR {relative_path}")
 
-        if not dirpath.exists():
-            print(f"  -> WARNING: Directory {relative_path} does not exist. Skipping deletion.")
-            return True
-        
-        if not dirpath.is_dir():
-            print(f"  -> ERROR: Path {relative_path} is a file, not a directory. Cannot delete with DELETE_DIR.")
-            return False
-            
         try:
-            # Use shutil.rmtree for safe recursive deletion
+            # Use shutil.rmtree for safe recursive deletion; EAFP — the
+            # rmtree itself tells us whether the path was missing or a file,
+            # no separate exists()/is_dir() probes
+            import shutil
             shutil.rmtree(dirpath)
             print(f"  -> SUCCESS: Directory deleted at {relative_path}.")
             return True
+        except FileNotFoundError:
+            print(f"  -> WARNING: Directory {relative_path} does not exist. Skipping deletion.")
+            return True
+        except NotADirectoryError:
+            print(f"  -> ERROR: Path {relative_path} is a file, not a directory. Cannot delete with DELETE_DIR.")
+            return False
         except Exception as e:
             print(f"  -> ERROR: Failed to delete directory {relative_path}. Reason: {e}")
             return False
 
-    def _execute_modify(self, filepath: Path, new_file_content: str) -> bool:
+    def _execute_modify(self, filepath: Path, new_file_content: str, fs_state: Optional[Dict[str, tuple]] = None) -> bool:
         """
-        Reads the original file, generates a perfect diff using difflib 
-        from the new content provided by the LLM, and applies the diff.
+        Replaces the file content with the LLM-provided full content via an
+        atomic temp-file write. The LLM already supplies the complete new
+        file, so the previous diff-generate-then-reapply roundtrip only
+        reconstructed what we were handed; the diff survives as an optional
+        debug preview. fs_state is accepted for uniform dispatch but unused:
+        a modify must read the original file regardless.
         """
-        relative_path = filepath.relative_to(self.project_root)
+        relative_path = self._relative_str(filepath)
         print(f"  -> Action: MODIFY {relative_path}")
-        
-        original_lines = self._read_file_content(filepath)
-        if original_lines is None:
-            print(f"  -> ERROR: Original file not found or readable: {relative_path}. Cannot generate diff.")
-            return False
-        
-        new_lines = new_file_content.splitlines(True)
-
-        diff_generator = difflib.unified_diff(
-            original_lines, 
-            new_lines, 
-            fromfile=f'a/{relative_path}', 
-            tofile=f'b/{relative_path}',
-            n=3 # Standard context lines
-        )
-        diff_content = "".join(diff_generator)
-        
-        print("\n  --- DEBUG: Diff Generated by difflib (Perfect Structure) ---")
-        print(diff_content.strip() if diff_content else "[DIFFLIB GENERATED EMPTY PATCH]")
-        print("  --------------------------------------------------\n")
-        
-        if not diff_content.strip():
-            print(f"  -> WARNING: No changes detected for {relative_path}. Skipping patch application.")
-            return True 
 
-        diff_tmp_path = self.project_root / f".{relative_path.name}.tmp.patch"
-        
+        new_bytes = new_file_content.encode('utf-8')
+        path_str = str(filepath)
+
+        # Signature short-circuit: if the file's (mtime_ns, size) still
+        # matches the signature recorded the last time we saw it holding
+        # exactly this content, skip the read entirely. LLM fix batches
+        # commonly re-echo unchanged files.
         try:
-            with open(diff_tmp_path, 'w', encoding='utf-8') as f:
-                f.write(diff_content) 
-            
-            result = subprocess.run(
-                ['git', 'apply', '--unidiff-zero', '--ignore-whitespace', str(diff_tmp_path)],
-                cwd=str(self.project_root), 
-                capture_output=True, 
-                text=True, 
-                check=False 
-            )
-            
-            if result.returncode == 0:
-                print(f"  -> SUCCESS: Patch applied to {relative_path}.")
+            st = os.stat(filepath)
+        except OSError:
+            st = None
+        new_digest = hashlib.blake2b(new_bytes, digest_size=16).digest()
+        if st is not None:
+            sig = self._file_sig_cache.get(path_str)
+            if sig == (st.st_mtime_ns, st.st_size, new_digest):
+                print(f"  -> WARNING: No changes detected for {relative_path}. Skipping write.")
                 return True
-            else:
-                print(f"  -> ERROR: Failed to apply patch to {relative_path}.")
-                print(f"     Git Stderr:\n{result.stderr}")
-                return False
 
+        raw = self._read_file_content(filepath)
+        if raw is None:
+            print(f"  -> ERROR: Original file not found or readable: {relative_path}. Cannot modify.")
+            return False
+
+        # Bytes-level equality check: one encode of the new content, no
+        # per-line str allocations for what is usually a changed file anyway
+        if raw == new_bytes:
+            if st is not None:
+                self._file_sig_cache[path_str] = (st.st_mtime_ns, st.st_size, new_digest)
+            print(f"  -> WARNING: No changes detected for {relative_path}. Skipping write.")
+            return True
+
+        if self.show_diff_preview:
+            import difflib
+            diff_content = "".join(difflib.unified_diff(
+                raw.decode('utf-8', errors='replace').splitlines(True),
+                new_file_content.splitlines(True),
+                fromfile=f'a/{relative_path}',
+                tofile=f'b/{relative_path}',
+                n=3 # Standard context lines
+            ))
+            print("\n  --- DEBUG: Diff Preview ---")
+            print(diff_content.strip())
+            print("  --------------------------------------------------\n")
+
+        # Write to a sibling temp file and rename, so a crash mid-write can
+        # never leave a truncated target file
+        tmp_path = filepath.with_suffix(filepath.suffix + '.tmp')
+        try:
+            tmp_path.write_text(new_file_content, encoding='utf-8')
+            os.replace(tmp_path, filepath)
+            try:
+                st = os.stat(filepath)
+                self._file_sig_cache[path_str] = (st.st_mtime_ns, st.st_size, new_digest)
+            except OSError:
+                pass
+            print(f"  -> SUCCESS: Content written to {relative_path}.")
+            return True
         except Exception as e:
-            print(f"  -> CRITICAL ERROR during patch application: {e}")
+            print(f"  -> ERROR: Failed to write {relative_path}. Reason: {e}")
+            if tmp_path.exists():
+                os.remove(tmp_path)
             return False
-            
-        finally:
-            if diff_tmp_path.exists():
-                os.remove(diff_tmp_path)
 
-    def _execute_create(self, filepath: Path, content: str) -> bool:
+    def _scan_targets(self, paths: List[Path]) -> Dict[str, tuple]:
+        """
+        Probes existence and type for all target paths with one os.scandir
+        pass per unique parent directory, instead of separate exists()/
+        is_dir() stat calls per action. Returns {path_str: (exists, is_dir)}.
+        """
+        by_parent: Dict[Path, set] = {}
+        for path in paths:
+            by_parent.setdefault(path.parent, set()).add(path.name)
+
+        fs_state: Dict[str, tuple] = {}
+        for parent, names in by_parent.items():
+            found: Dict[str, bool] = {}
+            try:
+                with os.scandir(parent) as entries:
+                    for entry in entries:
+                        if entry.name in names:
+                            found[entry.name] = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                pass  # Parent missing: all its targets are non-existent
+            for name in names:
+                path_str = os.path.join(str(parent), name)
+                fs_state[path_str] = (True, found[name]) if name in found else (False, False)
+        return fs_state
+
+    def _execute_create(self, filepath: Path, content: str, fs_state: Optional[Dict[str, tuple]] = None) -> bool:
         """
         Creates a new file with the provided content, ensuring parent directories exist.
         """
-        relative_path = filepath.relative_to(self.project_root)
+        relative_path = self._relative_str(filepath)
         print(f"  -> Action: CREATE {relative_path}")
-        
-        if filepath.exists():
+
+        # Batch scan already knows the answer at zero syscall cost; only
+        # trust it for the early-out, the link below is still exclusive
+        if fs_state is not None and fs_state.get(str(filepath), (False, False))[0]:
             print(f"  -> ERROR: Cannot create file, {relative_path} already exists. Skipping.")
             return False
-            
+
+        # Write to a sibling temp file and hard-link into place: atomic like
+        # os.replace, but raises FileExistsError instead of overwriting —
+        # EAFP, no separate exists() probe
+        tmp_path = filepath.with_suffix(filepath.suffix + '.tmp')
         try:
-            # Ensure parent directories exist (this handles nested paths automatically)
-            filepath.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
+            try:
+                tmp_path.write_text(content, encoding='utf-8')
+            except FileNotFoundError:
+                # Missing parent directory: the batch path pre-creates
+                # parents in bulk, but direct callers (agent GENERATE_CODE
+                # steps) may target a brand-new directory — build it now
+                os.makedirs(filepath.parent, exist_ok=True)
+                tmp_path.write_text(content, encoding='utf-8')
+            try:
+                os.link(tmp_path, filepath)
+            except FileExistsError:
+                print(f"  -> ERROR: Cannot create file, {relative_path} already exists. Skipping.")
+                return False
+
+            if fs_state is not None:
+                fs_state[str(filepath)] = (True, False)
             print(f"  -> SUCCESS: File created at {relative_path}.")
             return True
         except Exception as e:
             print(f"  -> ERROR: Failed to create file {relative_path}. Reason: {e}")
             return False
+        finally:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
 
-    def _execute_delete(self, filepath: Path) -> bool:
+    def _execute_delete(self, filepath: Path, content: str = '', fs_state: Optional[Dict[str, tuple]] = None) -> bool:
         """
         Deletes a file, confirming it exists before attempting removal.
+        content is accepted for uniform dispatch and ignored.
         """
-        relative_path = filepath.relative_to(self.project_root)
+        relative_path = self._relative_str(filepath)
         print(f"  -> Action: DELETE {relative_path}")
 
-        if not filepath.exists():
+        try:
+            # EAFP: one unlink syscall does the work and reports the
+            # failure mode, instead of a stat probe followed by the remove
+            os.unlink(filepath)
+        except FileNotFoundError:
             print(f"  -> WARNING: File {relative_path} does not exist. Skipping deletion.")
             return True # Consider successful if the file is already gone
-            
-        if filepath.is_dir():
+        except IsADirectoryError:
             print(f"  -> ERROR: Path {relative_path} is a directory, not a file. Use DELETE_DIR.")
             return False
-            
-        try:
-            os.remove(filepath)
-            print(f"  -> SUCCESS: File deleted at {relative_path}.")
-            return True
+        except PermissionError as e:
+            # Some platforms report EPERM for directory unlinks, but EACCES
+            # on a regular file (e.g. unwritable parent) lands here too —
+            # only call it a directory if it actually is one
+            if os.path.isdir(filepath):
+                print(f"  -> ERROR: Path {relative_path} is a directory, not a file. Use DELETE_DIR.")
+            else:
+                print(f"  -> ERROR: Failed to delete file {relative_path}. Reason: {e}")
+            return False
         except Exception as e:
             print(f"  -> ERROR: Failed to delete file {relative_path}. Reason: {e}")
             return False
 
+        if fs_state is not None:
+            fs_state[str(filepath)] = (False, False)
+        print(f"  -> SUCCESS: File deleted at {relative_path}.")
+        return True
+
+    @staticmethod
+    @contextmanager
+    def _buffered_stdout():
+        """
+        Temporarily replaces sys.stdout with a block-buffered wrapper for
+        the duration of an action batch. Each print inside the batch then
+        lands in the buffer instead of issuing its own write syscall; the
+        whole log is flushed once on exit. No-op when stdout has no binary
+        buffer (e.g. captured by a StringIO in tests).
+        """
+        stream = sys.stdout
+        buffer = getattr(stream, 'buffer', None)
+        if buffer is None:
+            yield
+            return
+        wrapper = io.TextIOWrapper(
+            buffer,
+            encoding=stream.encoding or 'utf-8',
+            errors='replace',
+            line_buffering=False,
+            write_through=False,
+        )
+        sys.stdout = wrapper
+        try:
+            yield
+        finally:
+            sys.stdout = stream
+            wrapper.flush()
+            # Detach so closing the wrapper (on GC) cannot close real stdout
+            wrapper.detach()
+
+    # Action name -> executor method, one hash lookup per action instead of
+    # a per-action .lower() plus an equality chain in the execute loop. All
+    # three executors share the (path, content, fs_state) signature.
+    _DISPATCH = {
+        'modify': '_execute_modify',
+        'create': '_execute_create',
+        'delete': '_execute_delete',
+    }
+
     def apply_multi_action_fix(self, raw_json_response: str) -> bool:
         """
         Main method to process and apply the LLM's structured multi-file actions (Legacy Fix command).
@@ -227,19 +481,33 @@ class CodeEditor:
             print("Action processing aborted due to JSON error.")
             return False
 
-        print(f"\n--- PROPOSED MULTI-FILE ACTIONS ({len(actions)} total) ---")
-        
-        # 1. Preview Actions
+        n = len(actions)
+        print(f"\n--- PROPOSED MULTI-FILE ACTIONS ({n} total) ---")
+
+        # 1. Preview + prepare in a single pass: each action is validated,
+        # resolved to its executor method and its full path exactly once
+        # here; the execute phase below runs straight over prepared ops.
+        # The preview itself is emitted as one write instead of N prints.
         # Note: The 'fix' command doesn't use the new CREATE_DIR/DELETE_DIR actions yet
+        lines = []
+        prepared = []
         for i, action in enumerate(actions, 1):
-            act = action.get('action', 'unknown').lower()
-            path = action.get('filepath', 'UNKNOWN_PATH')
-            
-            if not path or act not in ['modify', 'create', 'delete']:
-                print(f"[{i}/{len(actions)}] INVALID action object: {action}")
+            act = action.get('action', '')
+            relative_path = action.get('filepath', '')
+            # Exact lookup first: the LLM emits lowercase actions in the
+            # common case, so we only pay the .lower() allocation for
+            # oddly-cased responses
+            method_name = self._DISPATCH.get(act) or self._DISPATCH.get(act.lower())
+
+            if not relative_path or method_name is None:
+                lines.append(f"[{i}/{n}] INVALID action object: {action}")
                 continue
-                
-            print(f"[{i}/{len(actions)}] {act.upper()}: {path}")
+
+            lines.append(f"[{i}/{n}] {act.upper()}: {relative_path}")
+            prepared.append((act, relative_path, Path(self._root_str + relative_path),
+                             action.get('content', ''), method_name))
+
+        sys.stdout.write('\n'.join(lines) + '\n')
 
         print("\n---------------------------------------------------------")
         user_input = input("Apply ALL proposed changes? (y/N): ").strip().lower()
@@ -248,31 +516,47 @@ class CodeEditor:
             print("Action application cancelled by user. Files unchanged.")
             return False
 
-        # 2. Execute Actions
+        # Create every parent directory the CREATE actions need, once per
+        # unique parent (shortest first so nested packages build top-down),
+        # instead of re-walking the chain inside _execute_create per file
+        create_parents = {
+            str(op[2].parent) for op in prepared if op[4] == '_execute_create'
+        }
+        for parent in sorted(create_parents, key=len):
+            try:
+                os.makedirs(parent, exist_ok=True)
+            except OSError as e:
+                print(f"  -> ERROR: Could not create directory {parent}: {e}")
+
+        # Probe existence/type for all targets in one scandir pass per parent
+        fs_state = self._scan_targets([op[2] for op in prepared])
+
+        # 3. Execute Operations
+        # Actions on distinct paths are independent (file I/O releases the
+        # GIL), so group by target path — preserving order within a group —
+        # and run the groups in parallel
         print("\n--- EXECUTING ACTIONS ---")
-        all_successful = True
-        
-        for action in actions:
-            act = action.get('action', '').lower()
-            relative_path = action.get('filepath', '')
-            content = action.get('content', '')
-            
-            if not relative_path: continue
 
-            full_path = self.project_root / relative_path
+        groups: Dict[str, List[tuple]] = {}
+        for op in prepared:
+            groups.setdefault(str(op[2]), []).append(op)
 
-            success = False
-            if act == 'modify':
-                success = self._execute_modify(full_path, content)
-            elif act == 'create':
-                success = self._execute_create(full_path, content)
-            elif act == 'delete':
-                success = self._execute_delete(full_path)
-            else:
-                print(f"  -> WARNING: Unknown action '{act}' skipped for {relative_path}.")
+        def run_group(ops) -> bool:
+            group_ok = True
+            for act, relative_path, full_path, content, method_name in ops:
+                success = getattr(self, method_name)(full_path, content, fs_state)
+
+                if not success:
+                    group_ok = False
+                    print(f"  -> FAILURE detected for action {act} on {relative_path}. Continuing...")
+            return group_ok
 
-            if not success:
-                all_successful = False
-                print(f"  -> FAILURE detected for action {act} on {relative_path}. Continuing...")
+        # Batch all per-action prints into one flush at the end: ~6 prints
+        # per action otherwise mean a write syscall each on large batches
+        with self._buffered_stdout():
+            if len(groups) > 1:
+                with ThreadPoolExecutor(max_workers=min(32, len(groups))) as pool:
+                    results = list(pool.map(run_group, groups.values()))
+                return all(results)
 
-        return all_successful
+            return run_group(prepared) if prepared else True
@@ -1,6 +1,7 @@
 import os
 import sys
 import argparse
+from functools import cached_property
 from pathlib import Path
 from typing import Optional
 
@@ -18,23 +19,49 @@ except ImportError as e:
     sys.exit(1)
 
 
-def setup_components(project_root: str):
-    """Initializes all core components."""
-    try:
-        root_path = Path(project_root)
-        if not (root_path / ".git").is_dir():
+class Components:
+    """
+    Lazy factory for the core components. Each component is built on first
+    attribute access (functools.cached_property) and reused afterwards, so
+    a subcommand only pays for what it actually touches — 'review' and
+    'generate' never construct a CodeEditor, for example.
+
+    NOTE: CodeAgent is initialized in run_agent as it needs all other components.
+    """
+
+    def __init__(self, project_root: str, model: str = DEFAULT_MODEL):
+        self.project_root = project_root
+        self.model = model
+        if not (Path(project_root) / ".git").is_dir():
             print(f"Warning: Project root '{project_root}' does not appear to be a Git repository.")
 
-        analyzer = CodeAnalyzer(project_root)
-        engine = PromptEngine(OLLAMA_GENERATE_ENDPOINT)
+    @cached_property
+    def analyzer(self):
+        try:
+            return CodeAnalyzer(self.project_root)
+        except FileNotFoundError as e:
+            print(f"Error setting up components: {e}")
+            sys.exit(1)
+
+    @cached_property
+    def engine(self):
+        return PromptEngine(OLLAMA_GENERATE_ENDPOINT)
+
+    @cached_property
+    def client(self):
         client = OllamaClient(OLLAMA_GENERATE_ENDPOINT)
-        editor = CodeEditor(project_root)
-        
-        # NOTE: CodeAgent is initialized in run_agent as it needs all other components
-        return analyzer, engine, client, editor
-    except FileNotFoundError as e:
-        print(f"Error setting up components: {e}")
-        sys.exit(1)
+        # Warm the model as soon as the client exists: the multi-second
+        # model load happens here once, not on the first real generation
+        client.preload(self.model)
+        return client
+
+    @cached_property
+    def editor(self):
+        try:
+            return CodeEditor(self.project_root)
+        except FileNotFoundError as e:
+            print(f"Error setting up components: {e}")
+            sys.exit(1)
 
 def run_fix(args):
     """
@@ -42,10 +69,10 @@ def run_fix(args):
     """
     print(f"\n[OllamaDev] Running fix for {args.filepath}...")
     
-    analyzer, engine, client, editor = setup_components(args.root)
+    c = Components(args.root, args.model)
 
     # 1. Get original content for context (needed for the LLM to generate the diff/actions)
-    context = analyzer.get_context(args.filepath, mode='full')
+    context = c.analyzer.get_context(args.filepath, mode='full')
     original_content = context['content']
     
     if original_content.startswith("FILE_ERROR"):
@@ -61,12 +88,12 @@ def run_fix(args):
         return
 
     # This prompt instructs the LLM to return a JSON array of actions
-    payload = engine.create_fix_prompt(context, traceback, args.model)
+    payload = c.engine.create_fix_prompt(context, traceback, args.model)
 
     # 3. Call the LLM
     print(f"Sending request to Ollama ({args.model})...")
     # This output is expected to be a raw JSON string (cleaned of markdown fences)
-    json_actions_output = client.generate_content(payload)
+    json_actions_output = c.client.generate_content(payload)
 
     if json_actions_output.startswith("ERROR:"):
         print(f"LLM/Client Error: {json_actions_output}")
@@ -74,7 +101,7 @@ def run_fix(args):
 
     # 4. Apply the multi-action fix using the new editor method
     print("\n--- LLM Response Received ---")
-    if editor.apply_multi_action_fix(json_actions_output):
+    if c.editor.apply_multi_action_fix(json_actions_output):
         print("\nFix applied successfully (multi-action transaction complete).")
     else:
         print("\nFix application failed or was cancelled.")
@@ -84,10 +111,10 @@ def run_review(args):
     """Handles the 'review' command."""
     print(f"\n[OllamaDev] Running review for {args.filepath}...")
     
-    analyzer, engine, client, _ = setup_components(args.root)
-    
+    c = Components(args.root, args.model)
+
     # 1. Get context (prefer diff for review)
-    context = analyzer.get_context(args.filepath, mode='diff')
+    context = c.analyzer.get_context(args.filepath, mode='diff')
     
     if context['content'].startswith("GIT_ERROR"):
         print(f"Warning: Falling back to reviewing full file content.")
@@ -100,14 +127,14 @@ def run_review(args):
     if context['mode'] == 'full':
         review_request = "Review the entire file for quality and best practices."
         # Use the generate prompt template for full review
-        payload = engine.create_generate_prompt(context, review_request, args.model)
+        payload = c.engine.create_generate_prompt(context, review_request, args.model)
     else:
         # Use the specialized review prompt for diffs
-        payload = engine.create_review_prompt(context, args.model)
+        payload = c.engine.create_review_prompt(context, args.model)
 
     # 3. Call the LLM
     print(f"Sending request to Ollama ({args.model})...")
-    review_output = client.generate_content(payload)
+    review_output = c.client.generate_content(payload)
     
     # 4. Display the review
     print("\n--- CODE REVIEW RESULTS ---")
@@ -118,10 +145,10 @@ def run_generate(args):
     """Handles the 'generate' command (legacy single-file mode)."""
     print(f"\n[OllamaDev] Running code generation for {args.filepath}...")
     
-    analyzer, engine, client, _ = setup_components(args.root)
-    
+    c = Components(args.root, args.model)
+
     # 1. Get context (surrounding code for generation)
-    context = analyzer.get_context(args.filepath, mode='full')
+    context = c.analyzer.get_context(args.filepath, mode='full')
     
     # 2. Generate the generation prompt
     print(f"Generating generation prompt (Language: {context['language']})...")
@@ -132,11 +159,11 @@ def run_generate(args):
         print("Generation command requires a request. Aborting.")
         return
 
-    payload = engine.create_generate_prompt(context, user_request, args.model)
+    payload = c.engine.create_generate_prompt(context, user_request, args.model)
     
     # 3. Call the LLM
     print(f"Sending request to Ollama ({args.model})...")
-    generated_code = client.generate_content(payload)
+    generated_code = c.client.generate_content(payload)
 
     # 4. Display the generated code
     print("\n--- GENERATED CODE ---")
@@ -151,9 +178,9 @@ def run_agent(args):
     """
     print(f"\n[OllamaDev] Running Code Agent for goal: {args.goal}")
     
-    analyzer, engine, client, editor = setup_components(args.root)
-    
-    agent = CodeAgent(analyzer, client, engine, editor)
+    c = Components(args.root, args.model)
+
+    agent = CodeAgent(c.analyzer, c.client, c.engine, c.editor)
     
     if not args.goal:
         print("Agent command requires a specific goal (--goal). Aborting.")
@@ -1,7 +1,19 @@
+import atexit
 import requests
 import json
 import time
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+from config import HTTP_TIMEOUT, RETRY_BACKOFF, MAX_PARALLEL_REQUESTS, OLLAMA_KEEP_ALIVE
+
+try:
+    # orjson serializes straight to bytes in C, several times faster than
+    # the stdlib on the multi-KB fix/execute payloads built here
+    from orjson import dumps as _json_dumps
+except ImportError:
+    def _json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
 
 class OllamaClient:
     """
@@ -17,8 +29,39 @@ class OllamaClient:
             base_url: The full API endpoint URL (e.g., http://localhost:11434/api/generate).
         """
         self.base_url = base_url
+
+        # One keep-alive session for the client's lifetime: connections are
+        # reused across generate calls (and across concurrent plan waves)
+        # instead of paying a TCP handshake per request
+        self._session = requests.Session()
+        # Constant headers live on the session, not on every call; retries
+        # stay with our own backoff loop rather than the adapter's
+        self._session.headers.update({
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive',
+            'Accept-Encoding': 'gzip',
+        })
+        adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        atexit.register(self._session.close)
+
         print(f"Ollama Client initialized for endpoint: {self.base_url}")
 
+    @staticmethod
+    def _payload_dict(payload) -> Dict[str, Any]:
+        """
+        Converts an OllamaPayload NamedTuple to a plain dict at the HTTP
+        boundary (dropping an unset 'format'); plain dicts pass through
+        unchanged so ad-hoc payloads keep working.
+        """
+        if hasattr(payload, '_asdict'):
+            d = payload._asdict()
+            if d.get('format') is None:
+                del d['format']
+            return d
+        return payload
+
     def _cleanup_json_markdown(self, response_text: str) -> str:
         """
         Removes markdown code fences (```json, ```) from the response, 
@@ -39,6 +82,97 @@ class OllamaClient:
 
         return text
 
+    def preload(self, model_name: str) -> None:
+        """
+        Asks Ollama to load and pin the model before any real work arrives.
+        An empty prompt with a keep_alive window forces the model load now
+        and keeps it resident, so the first planning call starts decoding
+        immediately instead of paying multi-second cold-start latency.
+        Failures are non-fatal: the first generation then loads the model.
+        """
+        payload = {
+            "model": model_name,
+            "prompt": "",
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+        }
+        try:
+            self._session.post(self.base_url, data=_json_dumps(payload), timeout=HTTP_TIMEOUT)
+            print(f"Model '{model_name}' preload requested (keep_alive={OLLAMA_KEEP_ALIVE}).")
+        except Exception as e:
+            print(f"Warning: Model preload failed ({e}). First generation will pay the load cost.")
+
+    def _stream_records(self, payload: Dict[str, Any]):
+        """
+        Sends the payload with streaming forced on and yields each parsed
+        NDJSON record as it arrives from Ollama (one token group per line).
+        Raises on network/HTTP errors.
+        """
+        stream_payload = self._payload_dict(payload)
+        if not stream_payload.get('stream'):
+            stream_payload = dict(stream_payload)
+            stream_payload['stream'] = True
+
+        with self._session.post(self.base_url, data=_json_dumps(stream_payload), stream=True, timeout=HTTP_TIMEOUT) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                yield record
+                if record.get('done'):
+                    break
+
+    def stream_generate(self, payload: Dict[str, Any]):
+        """
+        Yields response text chunks as they arrive from Ollama. Raises on
+        network/HTTP errors; callers wanting the blocking contract should
+        use generate_content_streaming instead.
+        """
+        for record in self._stream_records(payload):
+            if 'response' in record:
+                yield record['response']
+
+    def generate_content_streaming(self, payload: Dict[str, Any]) -> str:
+        """
+        Streaming variant of generate_content with the same return contract.
+        Consuming the response incrementally overlaps LLM decode with network
+        transfer instead of idling until the full completion is buffered
+        server-side. A generation cut off by its token limit (done_reason
+        'length') returns an ERROR: marker instead of the truncated prefix,
+        so callers never mistake a partial file for a complete one. Falls
+        back to the retrying non-streaming path on failure.
+        """
+        try:
+            chunks = []
+            done_reason = None
+            for record in self._stream_records(payload):
+                if 'response' in record:
+                    chunks.append(record['response'])
+                if record.get('done'):
+                    done_reason = record.get('done_reason')
+            if done_reason == 'length':
+                return ("ERROR: Generation stopped at its token limit "
+                        "(done_reason=length); output is truncated and was discarded.")
+            return self._cleanup_json_markdown(''.join(chunks).strip())
+        except Exception as e:
+            print(f"Streaming request failed ({e}). Falling back to non-streaming call.")
+            return self.generate_content(payload)
+
+    def generate_many(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        """
+        Dispatches independent payloads concurrently over the pooled session
+        and returns their responses in input order. The workers block on the
+        Ollama server, not the GIL, so a small thread pool over keep-alive
+        connections gives the same overlap as async multiplexing would —
+        capped at MAX_PARALLEL_REQUESTS to match the server's parallel slots.
+        """
+        if not payloads:
+            return []
+        if len(payloads) == 1:
+            return [self.generate_content_streaming(payloads[0])]
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_REQUESTS, len(payloads))) as pool:
+            return list(pool.map(self.generate_content_streaming, payloads))
+
     def generate_content(self, payload: Dict[str, Any], max_retries: int = 5) -> str:
         """
         Sends the content generation payload to the Ollama server and retrieves the response.
@@ -52,16 +186,34 @@ class OllamaClient:
                  or an error message.
         """
         
-        headers = {'Content-Type': 'application/json'}
         response_text = "ERROR: Failed to connect to Ollama."
 
+        payload = self._payload_dict(payload)
+        streaming = bool(payload.get('stream'))
+        # Serialize the payload once up front: every retry attempt reuses
+        # the same encoded body instead of re-running dict-to-JSON encoding
+        body = _json_dumps(payload)
+
         for attempt in range(max_retries):
             try:
                 # 1. Send the POST request
-                response = requests.post(self.base_url, headers=headers, json=payload, timeout=300)
+                response = self._session.post(self.base_url, data=body, stream=streaming, timeout=HTTP_TIMEOUT)
                 
                 # 2. Check for successful HTTP status code
                 if response.status_code == 200:
+                    if streaming:
+                        # Streaming payload: accumulate the NDJSON chunks
+                        chunks = []
+                        for line in response.iter_lines():
+                            if not line:
+                                continue
+                            record = json.loads(line)
+                            if 'response' in record:
+                                chunks.append(record['response'])
+                            if record.get('done'):
+                                break
+                        return self._cleanup_json_markdown(''.join(chunks).strip())
+
                     # Ollama's /api/generate without streaming returns a single JSON object
                     result = response.json()
                     
@@ -82,7 +234,7 @@ class OllamaClient:
 
             except requests.exceptions.Timeout:
                 print(f"Attempt {attempt + 1}: Request timed out.")
-                response_text = "ERROR: Request timed out after 5 minutes."
+                response_text = "ERROR: Request timed out."
             except requests.exceptions.ConnectionError:
                 print(f"Attempt {attempt + 1}: Connection Error. Ensure Ollama is running at {self.base_url.rsplit('/', 1)[0]}")
                 response_text = "ERROR: Could not connect to Ollama server."
@@ -96,7 +248,7 @@ class OllamaClient:
 
             # 4. Implement Exponential Backoff and Retry
             if attempt < max_retries - 1:
-                wait_time = 2 ** attempt  # 1s, 2s, 4s, 8s, ...
+                wait_time = RETRY_BACKOFF * (2 ** attempt)  # 1s, 2s, 4s, 8s, ...
                 print(f"Retrying in {wait_time} seconds...")
                 time.sleep(wait_time)
             else:
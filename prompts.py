@@ -1,177 +1,424 @@
 import json
-from typing import Dict, Any, List
+import re
+import hashlib
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional
+
+from config import OLLAMA_NUM_CTX, OLLAMA_KEEP_ALIVE, CONTEXT_OUTPUT_RESERVE
+
+try:
+    # orjson decodes JSON in C, noticeably faster on multi-KB responses
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# One compiled pass to unwrap a ```json fence from an LLM response,
+# compiled at import instead of per extraction.
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+
+# System/user prompt templates, one pair per task, shared at module level by
+# every PromptEngine instance. Placeholders use str.format field names
+# ({language}, {LANG}, {filepath}, ...); literal braces are doubled. Keeping
+# one table instead of per-method f-string assembly gives every create_*
+# method the same single code path through _build.
+
+_SYS_TEMPLATES = {
+    # --- AGENT PLANNING PROMPT (Updated for stricter JSON array compliance) ---
+    'plan': (
+        "You are a world-class Code Agent Planner. Your task is to analyze the user's goal "
+        "and the project file structure, then generate a precise, actionable plan. "
+        "Your response MUST be ONLY a single JSON array of steps, wrapped in markdown fences (`json`). "
+        "The output MUST start with '[' and end with ']'. NEVER output a JSON object ('{{}}') or any commentary." # <--- REINFORCED INSTRUCTION
+        "Each step MUST be an object with the properties: 'action', 'target', and 'description'.\n\n"
+        "Action Types:\n"
+        "1. 'GET_CONTEXT': Read the content of a file (e.g., a dependency or class definition) into the agent's memory. Target MUST be the file path.\n"
+        "2. 'GENERATE_CODE': Create a brand new file (e.g., a test file) using the current context. Target MUST be the new file path.\n"
+        "3. 'MODIFY_CODE': Alter the content of an existing file (e.g., add a new method). Target MUST be the file path.\n"
+        "4. 'CREATE_DIR': Create a new directory or a nested directory structure. Target MUST be the directory path (e.g., 'src/api/v1').\n"
+        "5. 'DELETE_DIR': Delete an existing directory and all its contents. Target MUST be the directory path.\n"
+        "6. 'REPORT_SUCCESS': The final step to indicate the task is complete. Target MUST be empty ('').\n\n"
+        "CRITICAL: The sequence must be logical. Start by getting necessary context before generating/modifying code."
+    ),
+    'execute': (
+        "You are a specialist {LANG} Developer. Your task is to perform a single, atomic coding operation. "
+        "Analyze the accumulated code context and the specific task description. "
+        "Your output MUST be ONLY the FULL, COMPLETE, AND CORRECT CONTENT for the TARGET FILE named at the end of the request. "
+        "DO NOT include commentary, surrounding text, or markdown fences. The output must be ready to write to the file system."
+    ),
+    'review': (
+        "You are a meticulous Senior Software Engineer specializing in {LANG}. "
+        "Your task is to perform a detailed code review. Focus on security, performance, "
+        "maintainability, and adherence to language-specific best practices. "
+        "Provide your feedback in bullet points, referencing line numbers from the provided code context (the original file or the diff lines)."
+        "DO NOT rewrite the entire file or provide corrected code unless the issue is critical."
+    ),
+    'fix': (
+        "You are an expert bug fixer. Analyze each numbered file block ([0], [1], ...) "
+        "with its code and traceback. "
+        "Your response MUST be ONLY a single JSON array that details the required file system actions. "
+        "Do not include any commentary or surrounding text, and wrap the JSON in markdown fences."
+        "The JSON array must contain one or more objects, each with the following properties: "
+        "  - 'index': The integer tag of the file block this action belongs to. "
+        "  - 'action': 'modify', 'create', or 'delete'. "
+        "  - 'filepath': The path to the file (relative to the project root). "
+
+        "**CRITICAL RULE for 'modify' action:** The content MUST be the **FULL, COMPLETE, AND CORRECTED CONTENT of the target file**. "
+        "For 'create', content is the full new file content. For 'delete', content is empty."
+    ),
+    'generate': (
+        "You are a helpful coding assistant for {LANG}. "
+        "Write the requested code snippet cleanly and idiomatically. "
+        "Enclose your complete code response in a single markdown code block with the correct language tag."
+    ),
+}
+
+_USER_TEMPLATES = {
+    'plan': (
+        "GOAL: {goal}\n\n"
+        "PROJECT FILE STRUCTURE:\n"
+        "```text\n{codebase_summary}\n```\n\n"
+        "Generate the JSON array of action steps to achieve the GOAL."
+    ),
+    # The stable accumulated context leads and the per-step task trails:
+    # successive execute calls in one agent run then share a long identical
+    # (system + context) prefix, which Ollama's prefix cache can reuse
+    # instead of re-running prefill over the same file bodies every step
+    'execute': (
+        "ACCUMULATED CODE CONTEXT (Multiple Files):\n"
+        "{accumulated_context}\n\n"
+        "SPECIFIC TASK: {task_description}\n"
+        "TARGET FILE: {target_file}\n\n"
+        "Generate ONLY the FULL content for the file '{target_file}'."
+    ),
+    'review': (
+        "Please review the following code changes for the file `{filepath}` "
+        "which is a {language} project. The input is a unified diff, so only "
+        "focus your review on the lines prefixed with '+' or '-'.\n\n"
+        "```diff\n{content}\n```"
+    ),
+    'fix': (
+        "Each numbered block below is a file that is causing an error, "
+        "followed by its traceback.\n\n"
+        "{file_blocks}"
+        "\nGenerate the JSON array of actions (each tagged with its 'index') to fix these errors."
+    ),
+    'generate': (
+        "Based on the following surrounding code context (a {language} project):\n"
+        "```{language}\n{surrounding_code}\n```\n\n"
+        "Please complete the following request:\n{user_request}"
+    ),
+}
+
+
+class OllamaPayload(NamedTuple):
+    """
+    Immutable payload for the /api/generate endpoint. NamedTuple
+    construction skips per-key dict hashing and the instance is safe to
+    memoize and hand between threads; the HTTP client converts it to a dict
+    with _asdict() only at the send boundary.
+    """
+    model: str
+    prompt: str
+    system: str
+    stream: bool
+    keep_alive: str
+    options: Dict[str, Any]
+    format: Optional[str] = None
+
+
+# Context window requested per task. Planning only sees the goal and the
+# file list, so a small window avoids allocating (and re-allocating) KV
+# buffers it will never fill; execution carries multi-file context and gets
+# a large one. Tasks not listed use OLLAMA_NUM_CTX from config — set that
+# to 0 to omit num_ctx entirely and let the model default apply.
+_NUM_CTX = {
+    'plan': 2048,
+    'execute': 8192,
+}
+
+# Token budget for the accumulated context block of execution prompts —
+# the only _fit_context consumer — derived from the execute window so it
+# grows and shrinks with _NUM_CTX['execute'] instead of silently dropping
+# context that would have fit.
+_CONTEXT_TOKEN_BUDGET = _NUM_CTX['execute'] - CONTEXT_OUTPUT_RESERVE
+
+
+# Sampling temperature per task: low for structured/critical output
+# (planning, fixes, reviews), higher for open-ended generation. An explicit
+# table replaces the old substring scan over the whole system prompt.
+_TEMP = {
+    'plan': 0.1,
+    'fix': 0.2,
+    'review': 0.2,
+    'execute': 0.7,
+    'generate': 0.7,
+}
+
+
+# Tasks whose system prompt depends on at most the language: their rendered
+# system strings are memoized by (task, LANG) below.
+_CACHED_SYS_TASKS = frozenset({'plan', 'fix', 'review', 'generate', 'execute'})
+
+
+@lru_cache(maxsize=64)
+def _system_prompt(task: str, lang_up: str) -> str:
+    """
+    Memoized system-prompt rendering for the tiny (task, language) key
+    space: each pair is formatted once per process instead of per call.
+    """
+    return _SYS_TEMPLATES[task].format_map({'LANG': lang_up})
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    """
+    Singleton tokenizer loader: tiktoken builds its BPE table from disk on
+    get_encoding, so it must be constructed exactly once per process, never
+    in a per-call body. Returns None when tiktoken is not installed.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('cl100k_base')
+    except ImportError:
+        return None
+
+
+def _count_tokens(text: str) -> int:
+    """
+    Estimates the token count of `text` via the singleton encoder, falling
+    back to the ~4-chars-per-token rule of thumb, which is accurate enough
+    for budget trimming on source code.
+    """
+    enc = _encoder()
+    if enc is not None:
+        return len(enc.encode(text))
+    return len(text) // 4
+
+
+# Delimiter get_multiple_context places before every file block; used to
+# split the accumulated context back into per-file units for trimming.
+_FILE_MARKER = '\n/* --- FILE: '
+
+
+def _fit_context(context: str, budget: int = _CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Drops the oldest file blocks from an accumulated-context string until
+    its estimated token count fits the budget. Anything the server would
+    silently truncate is better not transmitted (or prefilled) at all. The
+    newest block always survives, and unstructured context is returned
+    unchanged.
+    """
+    if _count_tokens(context) <= budget:
+        return context
+
+    parts = context.split(_FILE_MARKER)
+    if len(parts) <= 2:
+        # Zero or one file block: nothing older to drop
+        return context
+
+    head = parts[0]
+    blocks = [_FILE_MARKER + p for p in parts[1:]]
+    dropped = 0
+    while len(blocks) > 1 and _count_tokens(head + ''.join(blocks)) > budget:
+        blocks.pop(0)
+        dropped += 1
+    if dropped:
+        print(f"  -> Context over token budget: dropped {dropped} oldest file block(s).")
+    return head + ''.join(blocks)
+
+
+@lru_cache(maxsize=32)
+def _upper(language: str) -> str:
+    """
+    Cached language.upper(): the same handful of language names recur on
+    every prompt in an agent run, so each is uppercased exactly once.
+    """
+    return language.upper()
+
 
 class PromptEngine:
     """
-    Generates structured payloads for the Ollama API, including system prompts 
+    Generates structured payloads for the Ollama API, including system prompts
     and user queries, tailored to specific coding tasks and languages.
+
+    All public create_* methods delegate to a single _build dispatcher over
+    the module-level template tables.
     """
 
     def __init__(self, ollama_url: str):
         """Initializes the PromptEngine with the target Ollama API URL."""
         self.ollama_url = ollama_url
+        # Bind both templates per task once: _build then does a single dict
+        # lookup per call instead of probing two module-level tables
+        self._tpl = {task: (_SYS_TEMPLATES[task], _USER_TEMPLATES[task])
+                     for task in _SYS_TEMPLATES}
+        # Memoized planning payloads keyed by (goal, summary digest, model):
+        # agent retry loops re-plan from an unchanged goal and file tree
+        self._plan_cache: Dict[tuple, OllamaPayload] = {}
         print(f"Prompt Engine initialized for base URL: {self.ollama_url}")
 
 
-    def _create_ollama_payload(self, system_prompt: str, user_prompt: str, model_name: str, enforce_json: bool = False) -> Dict[str, Any]:
+    @staticmethod
+    def extract_json(text: str):
         """
-        Creates the standard JSON payload structure for the Ollama /api/generate endpoint.
+        Decodes the JSON body of an LLM response, unwrapping a markdown
+        fence with a single compiled-regex pass when one is present.
+        Raises ValueError for undecodable responses.
         """
-        is_critical_task = enforce_json or "fix" in system_prompt.lower()
-        temperature = 0.1 if is_critical_task else 0.7
+        match = _FENCE_RE.search(text)
+        return _json_loads(match.group(1) if match else text.strip())
 
-        payload = {
-            "model": model_name,
-            "prompt": user_prompt,
-            "system": system_prompt,
-            "stream": False,
-            "options": {
-                "temperature": temperature,
-                "num_ctx": 4096,
-            },
-        }
-        
-        if enforce_json:
-            # Use 'format': 'json' for Ollama to try to enforce JSON output
-            payload['format'] = 'json' 
-            
-        return payload
+    def _create_ollama_payload(self, system_prompt: str, user_prompt: str, model_name: str, task: str = 'generate', enforce_json: bool = False, num_predict: Optional[int] = None) -> OllamaPayload:
+        """
+        Creates the standard payload for the Ollama /api/generate endpoint.
+        The task name selects the sampling temperature from _TEMP.
+        """
+        options = {"temperature": _TEMP.get(task, 0.7)}
 
-    # --- AGENT PLANNING PROMPT (Updated for stricter JSON array compliance) ---
-    def create_planning_prompt(self, goal: str, codebase_summary: str, model_name: str) -> Dict[str, Any]:
+        num_ctx = _NUM_CTX.get(task, OLLAMA_NUM_CTX)
+        if num_ctx:
+            options["num_ctx"] = num_ctx
+
+        if num_predict is not None:
+            # Cap decode length so a batch of short requests is not gated
+            # by the server reserving slots for a worst-case long generation
+            options["num_predict"] = num_predict
+
+        return OllamaPayload(
+            model=model_name,
+            prompt=user_prompt,
+            system=system_prompt,
+            # Stream by default: the client accumulates NDJSON chunks, which
+            # overlaps decode with transport and sidesteps Ollama's slow
+            # non-streaming buffering on long completions
+            stream=True,
+            # Keep the model resident between calls so only the first
+            # request of a session pays the model-load cost
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            options=options,
+            # 'format': 'json' asks Ollama to try to enforce JSON output
+            format='json' if enforce_json else None,
+        )
+
+    def _build(self, task: str, fields: Dict[str, Any], model_name: str, enforce_json: bool = False, num_predict: Optional[int] = None) -> OllamaPayload:
+        """
+        Renders the system/user templates for `task` with `fields` and wraps
+        the result in an Ollama payload. Single dispatch point for all tasks.
+        """
+        sys_tpl, user_tpl = self._tpl[task]
+        if task in _CACHED_SYS_TASKS:
+            system_prompt = _system_prompt(task, fields.get('LANG', ''))
+        else:
+            system_prompt = sys_tpl.format_map(fields)
+        user_prompt = user_tpl.format_map(fields)
+        return self._create_ollama_payload(system_prompt, user_prompt, model_name, task=task,
+                                           enforce_json=enforce_json, num_predict=num_predict)
+
+    def create_planning_prompt(self, goal: str, codebase_summary: str, model_name: str) -> OllamaPayload:
         """
-        Generates a prompt to ask the LLM to create a multi-step action plan 
+        Generates a prompt to ask the LLM to create a multi-step action plan
         based on the project structure and the high-level goal.
         """
-        
-        system_prompt = (
-            "You are a world-class Code Agent Planner. Your task is to analyze the user's goal "
-            "and the project file structure, then generate a precise, actionable plan. "
-            "Your response MUST be ONLY a single JSON array of steps, wrapped in markdown fences (`json`). "
-            "The output MUST start with '[' and end with ']'. NEVER output a JSON object ('{}') or any commentary." # <--- REINFORCED INSTRUCTION
-            "Each step MUST be an object with the properties: 'action', 'target', and 'description'.\n\n"
-            "Action Types:\n"
-            "1. 'GET_CONTEXT': Read the content of a file (e.g., a dependency or class definition) into the agent's memory. Target MUST be the file path.\n"
-            "2. 'GENERATE_CODE': Create a brand new file (e.g., a test file) using the current context. Target MUST be the new file path.\n"
-            "3. 'MODIFY_CODE': Alter the content of an existing file (e.g., add a new method). Target MUST be the file path.\n"
-            "4. 'CREATE_DIR': Create a new directory or a nested directory structure. Target MUST be the directory path (e.g., 'src/api/v1').\n"
-            "5. 'DELETE_DIR': Delete an existing directory and all its contents. Target MUST be the directory path.\n"
-            "6. 'REPORT_SUCCESS': The final step to indicate the task is complete. Target MUST be empty ('').\n\n"
-            "CRITICAL: The sequence must be logical. Start by getting necessary context before generating/modifying code."
-        )
+        digest = hashlib.blake2b(codebase_summary.encode('utf-8'), digest_size=16).digest()
+        key = (goal, digest, model_name)
+        cached = self._plan_cache.get(key)
+        if cached is None:
+            if len(self._plan_cache) >= 64:
+                self._plan_cache.clear()
+            fields = {'goal': goal, 'codebase_summary': codebase_summary}
+            cached = self._build('plan', fields, model_name, enforce_json=True)
+            self._plan_cache[key] = cached
 
-        user_prompt = (
-            f"GOAL: {goal}\n\n"
-            f"PROJECT FILE STRUCTURE:\n"
-            f"```text\n{codebase_summary}\n```\n\n"
-            f"Generate the JSON array of action steps to achieve the GOAL."
-        )
-        
-        return self._create_ollama_payload(system_prompt, user_prompt, model_name, enforce_json=True)
+        # Hand out a fresh options dict so callers mutating it cannot poison
+        # the cached instance (the tuple itself is immutable)
+        return cached._replace(options=dict(cached.options))
+
+    def clear_cache(self) -> None:
+        """Drops the memoized planning payloads (mainly for tests)."""
+        self._plan_cache.clear()
 
-    def create_execution_prompt(self, task_description: str, accumulated_context: str, target_file: str, project_language: str, model_name: str) -> Dict[str, Any]:
+    def create_execution_prompt(self, task_description: str, accumulated_context: str, target_file: str, project_language: str, model_name: str, num_predict: Optional[int] = None) -> OllamaPayload:
         """
-        Generates a prompt for the LLM to execute a single code generation/modification step 
+        Generates a prompt for the LLM to execute a single code generation/modification step
         using all accumulated file context.
         """
-        
-        system_prompt = (
-            f"You are a specialist {project_language.upper()} Developer. Your task is to perform a single, atomic coding operation. "
-            f"Analyze the accumulated code context and the specific task description. "
-            f"Your output MUST be ONLY the FULL, COMPLETE, AND CORRECT CONTENT for the target file '{target_file}'. "
-            f"DO NOT include commentary, surrounding text, or markdown fences. The output must be ready to write to the file system."
-        )
-
-        user_prompt = (
-            f"SPECIFIC TASK: {task_description}\n"
-            f"TARGET FILE: {target_file}\n\n"
-            f"ACCUMULATED CODE CONTEXT (Multiple Files):\n"
-            f"{accumulated_context}\n\n"
-            f"Generate ONLY the FULL content for the file '{target_file}'."
-        )
-        
+        fields = {
+            'LANG': _upper(project_language),
+            'task_description': task_description,
+            'target_file': target_file,
+            'accumulated_context': _fit_context(accumulated_context),
+        }
         # Use a non-JSON payload for raw code output
-        return self._create_ollama_payload(system_prompt, user_prompt, model_name, enforce_json=False)
+        return self._build('execute', fields, model_name, num_predict=num_predict)
 
 
-    def create_review_prompt(self, context: Dict[str, str], model_name: str) -> Dict[str, Any]:
+    def create_review_prompt(self, context: Dict[str, str], model_name: str) -> OllamaPayload:
         """
         Generates a prompt for a comprehensive code review focused on changes (diff).
         """
         language = context['language']
-        content = context['content']
-        filepath = context['filepath']
-
-        system_prompt = (
-            f"You are a meticulous Senior Software Engineer specializing in {language.upper()}. "
-            "Your task is to perform a detailed code review. Focus on security, performance, "
-            "maintainability, and adherence to language-specific best practices. "
-            "Provide your feedback in bullet points, referencing line numbers from the provided code context (the original file or the diff lines)."
-            "DO NOT rewrite the entire file or provide corrected code unless the issue is critical."
-        )
+        fields = {
+            'language': language,
+            'LANG': _upper(language),
+            'filepath': context['filepath'],
+            'content': context['content'],
+        }
+        return self._build('review', fields, model_name)
 
-        user_prompt = (
-            f"Please review the following code changes for the file `{filepath}` "
-            f"which is a {language} project. The input is a unified diff, so only "
-            f"focus your review on the lines prefixed with '+' or '-'.\n\n"
-            f"```diff\n{content}\n```"
-        )
-        
-        return self._create_ollama_payload(system_prompt, user_prompt, model_name)
 
+    def create_fix_prompt_batch(self, contexts: List[Dict[str, str]], tracebacks: List[str], model_name: str) -> OllamaPayload:
+        """
+        Generates one prompt covering several (file, traceback) pairs. The
+        system prompt and network round trip are amortized across all of
+        them; each block carries an [index] tag and the LLM is instructed to
+        tag every action object with the index it belongs to.
+        """
+        blocks = []
+        for i, (context, error_traceback) in enumerate(zip(contexts, tracebacks)):
+            language = context['language']
+            blocks.append(
+                f"### [{i}] FILE: {context['filepath']} ({language})\n"
+                f"Traceback:\n```\n{error_traceback}\n```\n"
+                f"Current File Content:\n```{language}\n{context['content']}\n```\n"
+            )
+        fields = {'file_blocks': '\n'.join(blocks)}
+        return self._build('fix', fields, model_name, enforce_json=True)
 
-    def create_fix_prompt(self, context: Dict[str, str], error_traceback: str, model_name: str) -> Dict[str, Any]:
+    def create_fix_prompt(self, context: Dict[str, str], error_traceback: str, model_name: str) -> OllamaPayload:
         """
         Generates a prompt to fix a bug using the provided code and traceback.
-        
-        The LLM is strictly instructed to output a JSON object containing file actions 
-        (modify, create, delete).
+        Thin wrapper over create_fix_prompt_batch with a single block.
+
+        The LLM is strictly instructed to output a JSON array containing file
+        actions (modify, create, delete).
         """
-        language = context['language']
-        content = context['content']
-        filepath = context['filepath']
-
-        system_prompt = (
-            f"You are an expert bug fixer for {language.upper()} codebases. Analyze the provided code and traceback. "
-            "Your response MUST be ONLY a single JSON array that details the required file system actions. "
-            "Do not include any commentary or surrounding text, and wrap the JSON in markdown fences."
-            "The JSON array must contain one or more objects, each with the following properties: "
-            "  - 'action': 'modify', 'create', or 'delete'. "
-            "  - 'filepath': The path to the file (relative to the project root). "
-            
-            "**CRITICAL RULE for 'modify' action:** The content MUST be the **FULL, COMPLETE, AND CORRECTED CONTENT of the target file**. "
-            "For 'create', content is the full new file content. For 'delete', content is empty."
-        )
+        return self.create_fix_prompt_batch([context], [error_traceback], model_name)
 
-        user_prompt = (
-            f"The following {language} file `{filepath}` is causing an error. "
-            f"Traceback:\n```\n{error_traceback}\n```\n\n"
-            f"Current File Content:\n"
-            f"```{language}\n{content}\n```"
-            f"\n\nGenerate the JSON array of actions to fix this error."
-        )
-        
-        return self._create_ollama_payload(system_prompt, user_prompt, model_name, enforce_json=True)
+
+    def create_embed_payload(self, inputs: List[str], model_name: str) -> Dict[str, Any]:
+        """
+        Creates a payload for the batched /api/embed endpoint
+        (config.OLLAMA_EMBED_ENDPOINT). All texts go in one request via the
+        'input' list — never loop per-text over the legacy /api/embeddings
+        endpoint.
+        """
+        return {
+            "model": model_name,
+            "input": inputs,
+        }
 
 
-    def create_generate_prompt(self, context: Dict[str, str], user_request: str, model_name: str) -> Dict[str, Any]:
+    def create_generate_prompt(self, context: Dict[str, str], user_request: str, model_name: str) -> OllamaPayload:
         """
-        Generates a prompt for new code generation (e.g., writing a new function) 
+        Generates a prompt for new code generation (e.g., writing a new function)
         in the original single-file mode.
         """
         language = context['language']
-        surrounding_code = context['content']
-
-        system_prompt = (
-            f"You are a helpful coding assistant for {language.upper()}. "
-            "Write the requested code snippet cleanly and idiomatically. "
-            "Enclose your complete code response in a single markdown code block with the correct language tag."
-        )
-
-        user_prompt = (
-            f"Based on the following surrounding code context (a {language} project):\n"
-            f"```{language}\n{surrounding_code}\n```\n\n"
-            f"Please complete the following request:\n{user_request}"
-        )
-        
-        return self._create_ollama_payload(system_prompt, user_prompt, model_name)
+        fields = {
+            'language': language,
+            'LANG': _upper(language),
+            'surrounding_code': context['content'],
+            'user_request': user_request,
+        }
+        return self._build('generate', fields, model_name)
@@ -3,7 +3,9 @@ import os
 
 def run_git_command(command_parts, cwd='.'):
     """
-    Executes a git command within the specified directory (cwd) and returns stdout.
+    Executes a git command within the specified directory (cwd) and returns
+    raw stdout bytes. Skipping the eager text decode saves a full O(N) pass
+    on multi-MB diffs; callers that want a string use run_git_command_text.
 
     Args:
         command_parts (list): List of strings representing the Git command and its arguments.
@@ -11,32 +13,84 @@ def run_git_command(command_parts, cwd='.'):
         cwd (str): The directory to run the command in (typically the project root).
 
     Returns:
-        str: The standard output of the command, or an error message if the command fails.
+        bytes: The standard output of the command, or an error marker
+               (b"GIT_ERROR: ..." / b"ERROR: ...") if the command fails.
     """
     try:
         # Prepend 'git' to the command list to form the full execution command
         full_command = ['git'] + command_parts
-        
+
         # Use subprocess.run for robust command execution
         result = subprocess.run(
-            full_command, 
-            cwd=cwd, 
-            capture_output=True, 
-            text=True, 
+            full_command,
+            cwd=cwd,
+            capture_output=True,
             check=True,  # Raises subprocess.CalledProcessError for non-zero exit codes
-            encoding='utf-8'
         )
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
-        # Log the error and return the stderr content
+        # Log the error and return the stderr content (decoded only on the
+        # error path, where the cost does not matter)
+        stderr = e.stderr.decode('utf-8', errors='replace').strip()
         print(f"ERROR: Git command failed in {cwd}: {' '.join(full_command)}")
-        print(f"Stderr: {e.stderr.strip()}")
-        return f"GIT_ERROR: {e.stderr.strip()}"
+        print(f"Stderr: {stderr}")
+        return f"GIT_ERROR: {stderr}".encode('utf-8')
     except FileNotFoundError:
-        return "ERROR: Git command not found. Ensure Git is installed and in PATH."
+        return b"ERROR: Git command not found. Ensure Git is installed and in PATH."
+
+
+def read_git_head(project_root):
+    """
+    In-process fast path for `git rev-parse HEAD`: resolves .git/HEAD and
+    the referenced ref file (or packed-refs) with plain file reads, skipping
+    the fork+exec of a git subprocess — the dominant cost when the agent
+    polls repository state repeatedly. Returns the commit hex string, or
+    None for unusual layouts (worktrees, missing refs); callers then fall
+    back to run_git_command.
+    """
+    git_dir = os.path.join(project_root, '.git')
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'rb') as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+
+    if not head.startswith(b'ref: '):
+        # Detached HEAD stores the commit hash directly
+        return head.decode('ascii', errors='replace')
+
+    ref = head[5:]
+    ref_path = os.path.join(git_dir, *ref.decode('utf-8').split('/'))
+    try:
+        with open(ref_path, 'rb') as f:
+            return f.read().strip().decode('ascii', errors='replace')
+    except OSError:
+        pass
+
+    # Loose ref missing: the ref may have been packed
+    try:
+        with open(os.path.join(git_dir, 'packed-refs'), 'rb') as f:
+            for line in f:
+                if line.startswith((b'#', b'^')):
+                    continue
+                parts = line.strip().split(b' ', 1)
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0].decode('ascii', errors='replace')
+    except OSError:
+        pass
+    return None
+
+
+def run_git_command_text(command_parts, cwd='.'):
+    """
+    Convenience wrapper around run_git_command for string callers: decodes
+    the raw stdout bytes once here, keeping the GIT_ERROR/ERROR prefix
+    contract as str.
+    """
+    return run_git_command(command_parts, cwd=cwd).decode('utf-8', errors='replace')
 
 # Example usage (for testing, would be removed in final version):
 # if __name__ == '__main__':
 #     # This assumes you are in a Git repo for testing
-#     diff_output = run_git_command(['diff', 'HEAD', 'utils.py'])
+#     diff_output = run_git_command_text(['diff', 'HEAD', 'utils.py'])
 #     print(f"Diff Output:\n{diff_output}")